@@ -1,21 +1,40 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
+import logging
 import os
+import hashlib
+import re
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from dotenv import load_dotenv
+import orjson
 
 from chromadb_setup import (
     initialize_chromadb,
-    query_documents,
+    warm_up,
+    query_documents_batch,
+    rerank_documents,
+    fuse_results_rrf,
     add_documents_to_chromadb,
+    embed_texts_batched,
+    is_file_indexed,
+    mark_file_indexed,
 )
-from utils.response_generator import generate_detailed_response
-from utils.document_loader import load_documents, chunk_documents
+from utils.response_generator import generate_detailed_response, generate_query_variants
+from utils.document_loader import load_document, chunk_documents
 from werkzeug.utils import secure_filename
 from utils.file_analyzer import FileAnalyzer
+from utils.cache import LRUCache
+from utils.semantic_cache import SemanticCache
+from utils.http import session as http_session
+from utils.json_provider import OrjsonProvider
 from next_steps_graph import run_next_steps_graph
 
-import requests
 # from werkzeug.serving import WSGIRequestHandler
 # WSGIRequestHandler.timeout = 120
 
@@ -23,14 +42,30 @@ import requests
 
 load_dotenv()
 
+# Production defaults to WARNING so per-request INFO logging costs nothing.
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "WARNING").upper(),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+)
+logger = logging.getLogger(__name__)
+
 app = Flask(__name__)
-CORS(app)
+app.json_provider_class = OrjsonProvider
+app.json = OrjsonProvider(app)
+# Flask-CORS answers OPTIONS preflights itself; no before_request shim needed.
+CORS(
+    app,
+    resources={r"/api/*": {"origins": "*"}},
+    supports_credentials=False,
+    allow_headers=["Content-Type", "Authorization"],
+    methods=["GET", "PUT", "POST", "DELETE", "OPTIONS"],
+)
 
 UPLOAD_FOLDER = os.getenv("UPLOAD_DIR", "./uploaded_documents")
 MAX_FILE_SIZE = int(os.getenv("MAX_UPLOAD_SIZE", 50)) * 1024 * 1024
 
 # Allow images too if you want to analyze them
-ALLOWED_EXTENSIONS = {"pdf", "docx", "xlsx", "txt", "png", "jpg", "jpeg"}
+ALLOWED_EXTENSIONS = frozenset({"pdf", "docx", "xlsx", "txt", "png", "jpg", "jpeg"})
 
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
@@ -40,8 +75,242 @@ GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY", "")
 OLLAMA_API_URL = os.getenv("OLLAMA_API_URL", "http://localhost:11434")
 
 
+# Response timestamps are informational, so they are refreshed at most once
+# per second instead of formatting datetime.now() on every request.
+_timestamp_cache = (0.0, "")
+
+
+def now_iso() -> str:
+    global _timestamp_cache
+
+    now = time.time()
+    cached_at, cached = _timestamp_cache
+    if now - cached_at >= 1.0:
+        cached = datetime.fromtimestamp(now).isoformat()
+        _timestamp_cache = (now, cached)
+    return cached
+
+
+MAX_JSON_BODY_BYTES = 64 * 1024
+MAX_QUERY_CHARS = 4096
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def _normalize_query(text) -> str:
+    """Collapse whitespace and cap length before the query reaches Chroma/LLMs."""
+    if not isinstance(text, str):
+        return ""
+    return _WHITESPACE_RE.sub(" ", text[:MAX_QUERY_CHARS]).strip()
+
+
+def _parse_json_body():
+    """
+    Parse a JSON object body with orjson without caching the raw bytes on the
+    request. Malformed or non-object bodies give {}; bodies larger than
+    MAX_JSON_BODY_BYTES give None so the caller can answer 413.
+    """
+    if (request.content_length or 0) > MAX_JSON_BODY_BYTES:
+        return None
+
+    # Read at most one byte past the limit, so a chunked body without a
+    # Content-Length is never buffered in full
+    parts = []
+    size = 0
+    while size <= MAX_JSON_BODY_BYTES:
+        part = request.stream.read(MAX_JSON_BODY_BYTES + 1 - size)
+        if not part:
+            break
+        parts.append(part)
+        size += len(part)
+    if size > MAX_JSON_BODY_BYTES:
+        return None
+    raw = b"".join(parts)
+
+    try:
+        data = orjson.loads(raw) if raw else {}
+    except orjson.JSONDecodeError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
 def allowed_file(filename: str) -> bool:
-    return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
+    dot = filename.rfind(".")
+    return dot != -1 and filename[dot + 1:].lower() in ALLOWED_EXTENSIONS
+
+
+UPLOAD_CHUNK_SIZE = 1 << 20
+_UPLOAD_OPEN_FLAGS = (
+    os.O_WRONLY | os.O_CREAT | os.O_TRUNC
+    | getattr(os, "O_CLOEXEC", 0) | getattr(os, "O_BINARY", 0)
+)
+
+
+def _persist_upload(file):
+    """
+    Save an uploaded file as UPLOAD_FOLDER/<sha256>/<filename>.
+
+    The request stream is written in 1 MB chunks straight to a raw fd, and
+    size + SHA-256 are computed in the same pass, so the bytes are read once.
+    Bytes go to a per-request temp file that is renamed into its
+    content-addressed directory, so concurrent uploads with the same name
+    never share a path and a path always holds the bytes its hash names.
+    Returns (filename, filepath, size, sha256_hex).
+    """
+    filename = secure_filename(file.filename)
+    tmp_path = os.path.join(UPLOAD_FOLDER, f".{uuid.uuid4().hex}.part")
+
+    digest = hashlib.sha256()
+    size = 0
+    fd = os.open(tmp_path, _UPLOAD_OPEN_FLAGS, 0o644)
+    try:
+        while True:
+            chunk = file.stream.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            view = memoryview(chunk)
+            while view:
+                written = os.write(fd, view)
+                view = view[written:]
+            digest.update(chunk)
+            size += len(chunk)
+    except BaseException:
+        os.close(fd)
+        os.remove(tmp_path)
+        raise
+    os.close(fd)
+
+    file_hash = digest.hexdigest()
+    file_dir = os.path.join(UPLOAD_FOLDER, file_hash)
+    os.makedirs(file_dir, exist_ok=True)
+    filepath = os.path.join(file_dir, filename)
+    os.replace(tmp_path, filepath)
+    return filename, filepath, size, file_hash
+
+
+# Retrieval results keyed by (collection version, normalized query). The version
+# bumps on every upload in this process; the TTL bounds staleness for uploads
+# handled by other Gunicorn workers.
+_retrieval_cache = LRUCache(maxsize=512, ttl=300)
+_collection_version = 0
+
+# Full chat answers keyed by query embedding, so near-duplicate questions skip
+# retrieval and both LLM calls. Entries are guarded by the collection version
+# seen when the request started and by the query's numbers / codes, so an
+# answer computed before a re-index, or for "ACCT 201" vs "ACCT 202", is never
+# served. Cleared together with the retrieval cache.
+_response_cache = SemanticCache(
+    maxsize=int(os.getenv("SEMANTIC_CACHE_SIZE", 1024)),
+    threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.95)),
+    ttl=300,
+)
+
+# Paraphrases generated per question for multi-query retrieval (0 disables).
+MULTI_QUERY_VARIANTS = int(os.getenv("MULTI_QUERY_VARIANTS", 3))
+# Paraphrase generation (a Gemini call) runs here while the request thread
+# searches Chroma with the original question.
+_variant_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="query-variants")
+
+# Tokens containing a digit, or all-caps acronyms / codes
+_GUARD_TOKEN_RE = re.compile(r"\b(?:\w*\d\w*|[A-Z]{2,})\b")
+
+
+def _cache_guard(user_query: str, version: int):
+    """Response-cache guard: hits must share the collection version and exact tokens."""
+    tokens = frozenset(t.lower() for t in _GUARD_TOKEN_RE.findall(user_query))
+    return version, tokens
+
+
+def _retrieve(user_query: str, query_vector=None):
+    """Multi-query retrieval + rerank, memoized per normalized query."""
+    # user_query is already whitespace-normalized by _normalize_query
+    query_hash = hashlib.blake2b(user_query.lower().encode("utf-8")).hexdigest()
+    key = (_collection_version, query_hash)
+
+    retrieved = _retrieval_cache.get(key)
+    if retrieved is None:
+        # Query ChromaDB with the question + paraphrases, fuse the rankings
+        # (RRF), then let the cross-encoder pick the best
+        variants_future = _variant_executor.submit(
+            generate_query_variants, user_query, MULTI_QUERY_VARIANTS
+        )
+        result_sets = query_documents_batch(
+            collection,
+            [user_query],
+            n_results=20,
+            query_embeddings=None if query_vector is None else [query_vector],
+        )
+        variants = variants_future.result()
+        if variants:
+            result_sets += query_documents_batch(collection, variants, n_results=20)
+        retrieved = fuse_results_rrf(result_sets, n_results=20)
+        retrieved = rerank_documents(user_query, retrieved, top_k=5)
+        if retrieved.get("documents"):
+            _retrieval_cache.set(key, retrieved)
+    return retrieved
+
+
+# Single writer thread: ChromaDB commits run here while the upload worker
+# extracts the next file.
+_commit_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chroma-commit")
+MAX_PENDING_COMMITS = 4
+
+
+def _index_files(filepaths, file_hashes=None) -> int:
+    """
+    Extract + chunk each file and commit it to ChromaDB.
+
+    Producer/consumer: this thread extracts and chunks (Unstructured / Gemini
+    Vision) while the commit thread embeds and writes earlier files, with at
+    most MAX_PENDING_COMMITS files queued between the two. Files whose hash
+    (from `file_hashes`) has already been indexed are skipped without
+    re-extracting them.
+    """
+    global _collection_version
+
+    file_hashes = file_hashes or {}
+    added = 0
+    pending = deque()
+
+    def _finish_oldest():
+        nonlocal added
+        future, filepath, file_hash, chunk_count = pending.popleft()
+        added += future.result()
+        # Every batch of this file is committed. Files that produced no
+        # chunks (e.g. Gemini Vision unavailable) stay unmarked so a
+        # re-upload retries them.
+        if file_hash and chunk_count:
+            mark_file_indexed(file_hash, os.path.basename(filepath), chunk_count)
+
+    try:
+        for filepath in filepaths:
+            file_hash = file_hashes.get(filepath)
+            if file_hash and is_file_indexed(collection, file_hash):
+                continue
+
+            chunks = chunk_documents(load_document(filepath))
+            extra_metadata = {"file_sha256": file_hash} if file_hash else None
+            pending.append(
+                (
+                    _commit_executor.submit(
+                        add_documents_to_chromadb, collection, chunks, extra_metadata=extra_metadata
+                    ),
+                    filepath,
+                    file_hash,
+                    len(chunks),
+                )
+            )
+            while len(pending) > MAX_PENDING_COMMITS:
+                _finish_oldest()
+
+        while pending:
+            _finish_oldest()
+    finally:
+        for future, *_ in pending:
+            future.cancel()
+        _collection_version += 1
+        _retrieval_cache.clear()
+        _response_cache.clear()
+    return added
 
 
 # -----------------------------------------------------------------------------
@@ -49,11 +318,61 @@ def allowed_file(filename: str) -> bool:
 # -----------------------------------------------------------------------------
 try:
     collection = initialize_chromadb()
-    print("✓ ChromaDB initialized successfully")
+    logger.info("ChromaDB initialized successfully")
 except Exception as e:
-    print(f"✗ Error initializing ChromaDB: {e}")
+    logger.error("Error initializing ChromaDB: %s", e)
     collection = None
 
+# Pay model loading / index mmap at boot instead of on the first /api/chat
+if collection and os.getenv("WARMUP_ON_START", "1") == "1":
+    try:
+        warm_up(collection)
+        logger.info("ChromaDB and embedding models warmed up")
+    except Exception as e:
+        logger.warning("Warm-up failed: %s", e)
+
+    # Open a pooled keep-alive connection to Ollama before the first request
+    try:
+        http_session.get(f"{OLLAMA_API_URL}/api/tags", timeout=2)
+    except Exception as e:
+        logger.info("Ollama not reachable during warm-up: %s", e)
+
+
+# Cached document count so status polling doesn't hit collection.count().
+# Local uploads bump it directly; it re-syncs from ChromaDB every
+# DOC_COUNT_REFRESH_SECONDS to pick up writes from other workers.
+DOC_COUNT_REFRESH_SECONDS = int(os.getenv("DOC_COUNT_REFRESH_SECONDS", 60))
+_doc_count_lock = threading.Lock()
+_doc_count = 0
+_doc_count_synced_at = None  # None forces the first sync
+
+
+def _get_doc_count() -> int:
+    global _doc_count, _doc_count_synced_at
+
+    if not collection:
+        return 0
+
+    with _doc_count_lock:
+        if (
+            _doc_count_synced_at is None
+            or time.monotonic() - _doc_count_synced_at > DOC_COUNT_REFRESH_SECONDS
+        ):
+            _doc_count = collection.count()
+            _doc_count_synced_at = time.monotonic()
+        return _doc_count
+
+
+def _add_to_doc_count(added: int) -> None:
+    global _doc_count
+
+    with _doc_count_lock:
+        _doc_count += added
+
+
+if collection:
+    _get_doc_count()
+
 
 # -----------------------------------------------------------------------------
 # Health check / status
@@ -65,7 +384,7 @@ def health_check():
             {
                 "status": "healthy",
                 "message": "Finance Chatbot Backend is running",
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": now_iso(),
             }
         ),
         200,
@@ -78,8 +397,8 @@ def get_status():
         status = {
             "backend": "running",
             "chromadb": "connected" if collection else "disconnected",
-            "documents": collection.count() if collection else 0,
-            "timestamp": datetime.now().isoformat(),
+            "documents": _get_doc_count(),
+            "timestamp": now_iso(),
         }
         return jsonify(status), 200
     except Exception as e:
@@ -92,8 +411,18 @@ def get_status():
 @app.route("/api/chat", methods=["POST"])
 def chat():
     try:
-        data = request.json or {}
-        user_query = data.get("message", "").strip()
+        data = _parse_json_body()
+        if data is None:
+            return (
+                jsonify(
+                    {
+                        "error": "Payload too large",
+                        "response": "Your message is too long.",
+                    }
+                ),
+                413,
+            )
+        user_query = _normalize_query(data.get("message") or data.get("query") or "")
 
         if not user_query:
             return (
@@ -117,34 +446,38 @@ def chat():
                 500,
             )
 
-        # Retrieve passages from ChromaDB
-        retrieved_data = query_documents(collection, user_query, n_results=10)
-
-        # Let response_generator build the full RAG answer
-                # Let response_generator build the full RAG answer
-        response_data = generate_detailed_response(user_query, retrieved_data)
+        use_cache = request.headers.get("X-No-Cache") != "1"
+        query_vector = embed_texts_batched([user_query])[0]
+        guard = _cache_guard(user_query, _collection_version)
+
+        payload = _response_cache.get(query_vector, guard=guard) if use_cache else None
+        if payload is None:
+            retrieved_data = _retrieve(user_query, query_vector)
+
+            # Let response_generator build the full RAG answer
+            response_data = generate_detailed_response(user_query, retrieved_data)
+
+            payload = {
+                "response": response_data["main_response"],
+                "key_points": response_data["key_points"],
+                "sections": response_data["sections"],
+                "google_raw": response_data["google_raw"],
+                "ollama_raw": response_data["ollama_raw"],
+                "model_used": response_data["model_used"],
+                "passages": response_data["passages"],
+                "url_summaries": response_data.get("url_summaries", []),
+            }
+            if use_cache and retrieved_data.get("documents"):
+                _response_cache.set(query_vector, payload, guard=guard)
 
         return (
-            jsonify(
-                {
-                    "response": response_data["main_response"],
-                    "key_points": response_data["key_points"],
-                    "sections": response_data["sections"],
-                    "google_raw": response_data["google_raw"],
-                    "ollama_raw": response_data["ollama_raw"],
-                    "model_used": response_data["model_used"],
-                    "passages": response_data["passages"],
-                    "url_summaries": response_data.get("url_summaries", []),
-                    "timestamp": datetime.now().isoformat(),
-                    "status": "success",
-                }
-            ),
+            jsonify({**payload, "timestamp": now_iso(), "status": "success"}),
             200,
         )
 
 
     except Exception as e:
-        print(f"Error in chat endpoint: {e}")
+        logger.exception("Error in chat endpoint: %s", e)
         return (
             jsonify({"error": str(e), "response": "An error occurred."}),
             500,
@@ -154,6 +487,69 @@ def chat():
 # -----------------------------------------------------------------------------
 # Upload & index files into ChromaDB
 # -----------------------------------------------------------------------------
+# Indexing runs on a background thread so /api/upload can answer 202 as soon
+# as the files are on disk; clients poll /api/upload/status/<job_id>.
+# Job state is process-local, which is why gunicorn.conf.py runs one worker.
+# Finished jobs are kept for UPLOAD_JOB_TTL_SECONDS and at most MAX_UPLOAD_JOBS
+# of them; queued / processing jobs are never evicted.
+MAX_UPLOAD_JOBS = 200
+UPLOAD_JOB_TTL_SECONDS = int(os.getenv("UPLOAD_JOB_TTL_SECONDS", 3600))
+_upload_jobs = OrderedDict()
+_upload_jobs_finished_at = OrderedDict()  # job_id -> time.monotonic(), oldest first
+_upload_jobs_lock = threading.Lock()
+_upload_queue = queue.Queue()
+
+
+def _prune_jobs() -> None:
+    """Drop expired finished jobs, then the oldest finished ones over the cap."""
+    now = time.monotonic()
+    while _upload_jobs_finished_at:
+        job_id, finished_at = next(iter(_upload_jobs_finished_at.items()))
+        expired = now - finished_at > UPLOAD_JOB_TTL_SECONDS
+        if not expired and len(_upload_jobs) <= MAX_UPLOAD_JOBS:
+            break
+        del _upload_jobs_finished_at[job_id]
+        _upload_jobs.pop(job_id, None)
+
+
+def _set_job(job_id: str, **fields) -> None:
+    with _upload_jobs_lock:
+        _upload_jobs.setdefault(job_id, {}).update(fields)
+        if fields.get("status") in ("done", "error"):
+            _upload_jobs_finished_at[job_id] = time.monotonic()
+        _prune_jobs()
+
+
+def _upload_worker() -> None:
+    while True:
+        job_id, file_hashes = _upload_queue.get()
+        _set_job(job_id, status="processing", started_at=now_iso())
+        try:
+            # Only the files saved by this request; earlier uploads are
+            # already in ChromaDB.
+            count = _index_files(list(file_hashes), file_hashes)
+            _add_to_doc_count(count)
+            _set_job(
+                job_id,
+                status="done",
+                documents_added=count,
+                finished_at=now_iso(),
+            )
+        except Exception as e:
+            logger.exception("Error indexing upload job %s: %s", job_id, e)
+            _set_job(
+                job_id,
+                status="error",
+                error=str(e),
+                finished_at=now_iso(),
+            )
+        finally:
+            _upload_queue.task_done()
+
+
+threading.Thread(target=_upload_worker, name="upload-worker", daemon=True).start()
+
+
 @app.route("/api/upload", methods=["POST"])
 def upload_documents():
     try:
@@ -170,35 +566,41 @@ def upload_documents():
 
         files = request.files.getlist("files")
         uploaded_files = []
+        file_hashes = {}
         errors = []
 
         for file in files:
             if file and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                filepath = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-                file.save(filepath)
+                filename, filepath, _, file_hash = _persist_upload(file)
+                file_hashes[filepath] = file_hash
                 uploaded_files.append(filename)
             elif file:
                 errors.append(f"{file.filename} - Invalid file type")
 
         if uploaded_files:
-            print(f"Processing {len(uploaded_files)} uploaded files.")
-
-            raw_docs = load_documents(app.config["UPLOAD_FOLDER"])
-            chunks = chunk_documents(raw_docs)
-            count = add_documents_to_chromadb(collection, chunks)
+            logger.info("Queueing %d uploaded files.", len(uploaded_files))
+
+            job_id = uuid.uuid4().hex
+            _set_job(
+                job_id,
+                status="queued",
+                files=uploaded_files,
+                documents_added=0,
+                submitted_at=now_iso(),
+            )
+            _upload_queue.put((job_id, file_hashes))
 
             return (
                 jsonify(
                     {
-                        "status": "success",
-                        "message": f"Successfully uploaded {len(uploaded_files)} file(s)",
+                        "status": "accepted",
+                        "message": f"Successfully uploaded {len(uploaded_files)} file(s); indexing started",
+                        "job_id": job_id,
                         "files_uploaded": uploaded_files,
-                        "documents_added": count,
                         "errors": errors,
                     }
                 ),
-                200,
+                202,
             )
         else:
             return (
@@ -213,13 +615,23 @@ def upload_documents():
             )
 
     except Exception as e:
-        print(f"Error uploading documents: {e}")
+        logger.exception("Error uploading documents: %s", e)
         return (
             jsonify({"error": str(e), "message": "Error uploading documents"}),
             500,
         )
 
 
+@app.route("/api/upload/status/<job_id>", methods=["GET"])
+def upload_status(job_id):
+    with _upload_jobs_lock:
+        job = dict(_upload_jobs.get(job_id) or {})
+
+    if not job:
+        return jsonify({"job_id": job_id, "status": "unknown"}), 404
+    return jsonify({"job_id": job_id, **job}), 200
+
+
 # -----------------------------------------------------------------------------
 # Document count
 # -----------------------------------------------------------------------------
@@ -232,7 +644,7 @@ def get_documents_count():
         return (
             jsonify(
                 {
-                    "total_documents": collection.count(),
+                    "total_documents": _get_doc_count(),
                     "status": "success",
                 }
             ),
@@ -257,34 +669,66 @@ def analyze_file():
         if not file or not allowed_file(file.filename):
             return jsonify({"error": "Invalid file type"}), 400
 
-        filename = secure_filename(file.filename)
-        filepath = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-        file.save(filepath)
+        filename, filepath, _, file_hash = _persist_upload(file)
 
         metadata = FileAnalyzer.extract_file_metadata(filepath, filename)
-        preview = FileAnalyzer.get_file_preview(filepath)
+        preview = FileAnalyzer.get_file_preview(filepath, content_hash=file_hash)
 
-        google_analysis = FileAnalyzer.analyze_with_google(filepath, preview)
-        ollama_analysis = FileAnalyzer.analyze_with_ollama(filepath, preview)
+        analysis = FileAnalyzer.analyze(filepath, preview)
 
         response_data = {
             "status": "success",
             "file": metadata,
             "preview": preview,
-            "analysis": {
-                "google": google_analysis,
-                "ollama": ollama_analysis,
-            },
-            "timestamp": datetime.now().isoformat(),
+            "analysis": analysis,
+            "timestamp": now_iso(),
         }
 
         return jsonify(response_data), 200
 
     except Exception as e:
-        print(f"Error analyzing file: {e}")
+        logger.exception("Error analyzing file: %s", e)
         return jsonify({"error": str(e), "status": "error"}), 500
 
 
+MAX_BATCH_FILES = 64
+
+# Caps how many files /api/batch-analyze sends to Gemini/Ollama at once.
+_analysis_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="batch-analyze")
+
+
+def _analyze_one(filepath: str, filename: str, file_hash: str = None):
+    metadata = FileAnalyzer.extract_file_metadata(filepath, filename)
+    preview = FileAnalyzer.get_file_preview(filepath, content_hash=file_hash)
+    analysis = FileAnalyzer.analyze(filepath, preview)
+
+    return {
+        "status": "success",
+        "file": metadata,
+        "preview": preview[:300],
+        "analysis": analysis,
+    }
+
+
+def _analysis_error(filename: str, size: int, error: str):
+    """Failed batch entry, shaped like a successful one so the UI can render it."""
+    provider_error = {"status": "error", "error": error}
+    return {
+        "status": "error",
+        "error": error,
+        "file": {
+            "filename": filename,
+            "file_type": os.path.splitext(filename)[1].lstrip(".").upper() or "UNKNOWN",
+            "file_size_kb": round(size / 1024, 2),
+        },
+        "preview": "",
+        "analysis": {
+            "google": {"source": "google", **provider_error},
+            "ollama": {"source": "ollama", **provider_error},
+        },
+    }
+
+
 @app.route("/api/batch-analyze", methods=["POST"])
 def batch_analyze():
     """Analyze multiple uploaded files"""
@@ -293,45 +737,50 @@ def batch_analyze():
             return jsonify({"error": "No files provided"}), 400
 
         files = request.files.getlist("files")
-        results = []
+        # Files past the cap are not analyzed; name them so the client knows
+        skipped = [f.filename for f in files[MAX_BATCH_FILES:] if f]
+        files = files[:MAX_BATCH_FILES]
 
+        # Save on the request thread (the upload streams belong to it), then
+        # analyze the files concurrently.
+        saved = []
         for file in files:
             if file and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                filepath = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-                file.save(filepath)
-
-                metadata = FileAnalyzer.extract_file_metadata(filepath, filename)
-                preview = FileAnalyzer.get_file_preview(filepath)
+                filename, filepath, size, file_hash = _persist_upload(file)
+                saved.append((filepath, filename, size, file_hash))
 
-                google_analysis = FileAnalyzer.analyze_with_google(filepath, preview)
-                ollama_analysis = FileAnalyzer.analyze_with_ollama(filepath, preview)
+        futures = [
+            (filename, size, _analysis_executor.submit(_analyze_one, filepath, filename, file_hash))
+            for filepath, filename, size, file_hash in saved
+        ]
 
-                results.append(
-                    {
-                        "file": metadata,
-                        "preview": preview[:300],
-                        "analysis": {
-                            "google": google_analysis,
-                            "ollama": ollama_analysis,
-                        },
-                    }
-                )
+        # One failing file shouldn't sink the whole batch
+        results = []
+        analyzed = 0
+        for filename, size, future in futures:
+            try:
+                results.append(future.result())
+                analyzed += 1
+            except Exception as e:
+                logger.exception("Error analyzing %s: %s", filename, e)
+                results.append(_analysis_error(filename, size, str(e)))
 
         return (
             jsonify(
                 {
                     "status": "success",
-                    "files_analyzed": len(results),
+                    "files_analyzed": analyzed,
+                    "files_failed": len(results) - analyzed,
+                    "skipped": skipped,
                     "results": results,
-                    "timestamp": datetime.now().isoformat(),
+                    "timestamp": now_iso(),
                 }
             ),
             200,
         )
 
     except Exception as e:
-        print(f"Error in batch analysis: {e}")
+        logger.exception("Error in batch analysis: %s", e)
         return jsonify({"error": str(e), "status": "error"}), 500
 
 
@@ -347,7 +796,7 @@ def ai_status():
         # Ollama
         ollama_status = "disconnected"
         try:
-            resp = requests.get(f"{OLLAMA_API_URL}/api/tags", timeout=5)
+            resp = http_session.get(f"{OLLAMA_API_URL}/api/tags", timeout=5)
             if resp.status_code == 200:
                 ollama_status = "connected"
         except Exception:
@@ -359,7 +808,7 @@ def ai_status():
                     "status": "success",
                     "google_api": google_status,
                     "ollama": ollama_status,
-                    "timestamp": datetime.now().isoformat(),
+                    "timestamp": now_iso(),
                 }
             ),
             200,
@@ -376,7 +825,9 @@ from flask import request, jsonify
 @app.route("/api/next-steps", methods=["POST"])
 def next_steps_endpoint():
     try:
-        data = request.json or {}
+        data = _parse_json_body()
+        if data is None:
+            return jsonify({"suggestions": [], "error": "Payload too large"}), 413
         user_question = data.get("user_question", "")
         answer_text = data.get("answer_text", "")
         key_points = data.get("key_points", [])
@@ -398,7 +849,7 @@ def next_steps_endpoint():
         return jsonify({"suggestions": suggestions}), 200
 
     except Exception as e:
-        print("🔥 Next Steps Error:", e)
+        logger.exception("Next Steps Error: %s", e)
         return jsonify({"suggestions": [], "error": str(e)}), 200
 
 # -----------------------------------------------------------------------------
@@ -1,71 +1,329 @@
+import hashlib
+import logging
 import os
-import uuid
+import sqlite3
+from collections import defaultdict
+import numpy as np
+import torch
 import chromadb
+from chromadb.errors import NotFoundError
 from chromadb.utils import embedding_functions
-from sentence_transformers import SentenceTransformer
+from sentence_transformers import SentenceTransformer, CrossEncoder
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 CHROMADB_PATH = os.getenv('CHROMADB_PATH', './chroma_db')
 DATA_DIR = os.getenv('DATA_DIR', './data/finance_docs')
 COLLECTION_NAME = 'finance_chatbot'
 EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
+CHROMA_BATCH_SIZE = int(os.getenv('CHROMA_BATCH_SIZE', 200))
+EMBED_BATCH_SIZE = int(os.getenv('EMBED_BATCH_SIZE', 64))
+RERANK_MODEL = os.getenv('RERANK_MODEL', 'cross-encoder/ms-marco-MiniLM-L-6-v2')
+# One row per fully indexed upload (file SHA-256)
+INDEX_STATE_PATH = os.getenv('INDEX_STATE_PATH', './indexed_files.db')
+# 'cuda' / 'cpu' / 'mps'; defaults to the GPU when one is visible
+EMBEDDING_DEVICE = os.getenv('EMBEDDING_DEVICE') or ('cuda' if torch.cuda.is_available() else 'cpu')
+
+_embedder = None
+_reranker = None
+
+
+def _get_embedder():
+    """Load the SentenceTransformer once and reuse it across requests"""
+    global _embedder
+    if _embedder is None:
+        _embedder = SentenceTransformer(EMBEDDING_MODEL, device=EMBEDDING_DEVICE)
+        if EMBEDDING_DEVICE == 'cuda':
+            # fp16 halves weight memory and transfer; vectors are still
+            # returned (and stored) as float32
+            _embedder.half()
+    return _embedder
+
+
+def _get_reranker():
+    """Load the cross-encoder once and reuse it across requests"""
+    global _reranker
+    if _reranker is None:
+        _reranker = CrossEncoder(RERANK_MODEL, device=EMBEDDING_DEVICE)
+    return _reranker
+
+
+def embed_texts_batched(texts, batch_size=EMBED_BATCH_SIZE):
+    """Encode texts in batches of ``batch_size`` with the shared embedding model"""
+    return _get_embedder().encode(
+        texts,
+        batch_size=batch_size,
+        convert_to_numpy=True,
+        normalize_embeddings=True,
+        show_progress_bar=False,
+    ).astype(np.float32, copy=False)
+
+class _SharedEmbeddingFunction(embedding_functions.SentenceTransformerEmbeddingFunction):
+    """
+    Chroma embedding function backed by the shared embedder.
+
+    Keeps the sentence_transformer name and config, so existing collections
+    still match, but never loads a second copy of the model.
+    """
+
+    def __init__(self):
+        self.model_name = EMBEDDING_MODEL
+        self.device = EMBEDDING_DEVICE
+        self.normalize_embeddings = True
+        self.kwargs = {}
+
+    def __call__(self, input):
+        return list(embed_texts_batched(list(input)))
 
 def initialize_chromadb():
     """Initialize ChromaDB with persistent storage"""
     os.makedirs(CHROMADB_PATH, exist_ok=True)
     client = chromadb.PersistentClient(path=CHROMADB_PATH)
-    embedding_function = embedding_functions.SentenceTransformerEmbeddingFunction(
-        model_name=EMBEDDING_MODEL
-    )
-    collection = client.get_or_create_collection(
-        name=COLLECTION_NAME,
-        embedding_function=embedding_function,
-        metadata={'hnsw:space': 'cosine'}
-    )
+    embedding_function = _SharedEmbeddingFunction()
+    try:
+        # Existing collections keep the distance they were created with
+        collection = client.get_collection(
+            name=COLLECTION_NAME,
+            embedding_function=embedding_function
+        )
+    except NotFoundError:
+        # All embeddings are unit-normalized, so inner product == cosine
+        # without the per-candidate norm computation
+        collection = client.create_collection(
+            name=COLLECTION_NAME,
+            embedding_function=embedding_function,
+            metadata={'hnsw:space': 'ip'}
+        )
     return collection
 
-def add_documents_to_chromadb(collection, chunks):
-    """Add chunked documents to ChromaDB"""
-    doc_texts = [str(chunk.text) for chunk in chunks if hasattr(chunk, 'text')]
-    doc_ids = [str(uuid.uuid4()) for _ in doc_texts]
-    doc_metadatas = []
-    
-    for chunk in chunks:
-        if hasattr(chunk, 'metadata') and chunk.metadata:
-            metadata = {k: str(v) for k, v in chunk.metadata.to_dict().items() if v}
-            doc_metadatas.append(metadata)
-        else:
-            doc_metadatas.append({'source': 'unknown'})
-    
-    if doc_texts:
+def chunk_id(text):
+    """Deterministic Chroma ID for a chunk: BLAKE2b-128 of its text"""
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+def _chunk_metadata(chunk, extra_metadata=None):
+    """Flatten a chunk's metadata to the str values Chroma accepts, skipping empties"""
+    meta = getattr(chunk, 'metadata', None)
+    if meta:
+        items = meta.items() if isinstance(meta, dict) else meta.to_dict().items()
+        metadata = {k: str(v) for k, v in items if v}
+    else:
+        metadata = {'source': 'unknown'}
+
+    if extra_metadata:
+        metadata.update(extra_metadata)
+    return metadata
+
+def add_documents_to_chromadb(collection, chunks, batch_size=CHROMA_BATCH_SIZE, extra_metadata=None):
+    """
+    Add chunked documents to ChromaDB in batches of ``batch_size``.
+
+    ``extra_metadata`` is merged into every chunk's metadata (e.g. the
+    source file's SHA-256 so later uploads can be deduplicated).
+    """
+    chunks = [chunk for chunk in chunks if hasattr(chunk, 'text')]
+    added = 0
+
+    for start in range(0, len(chunks), batch_size):
+        # Content-addressed IDs: the same chunk text always maps to the same
+        # ID, so repeats (within the batch or already stored) are never
+        # embedded twice. Stored repeats only get their metadata replaced,
+        # so source / url / file_sha256 all point at the latest upload.
+        by_id = {}
+        for chunk in chunks[start:start + batch_size]:
+            text = str(chunk.text)
+            by_id.setdefault(chunk_id(text), (chunk, text))
+
+        stored = collection.get(ids=list(by_id), include=['metadatas'])
+        existing = dict(zip(stored['ids'], stored['metadatas']))
+
+        doc_ids, doc_texts, doc_metadatas = [], [], []
+        seen_ids, seen_metadatas = [], []
+        for doc_id, (chunk, text) in by_id.items():
+            if doc_id in existing:
+                metadata = _chunk_metadata(chunk, extra_metadata)
+                # Chroma merges metadata on update; None deletes a key, so
+                # nothing from the earlier file (e.g. its url) survives
+                for key in existing[doc_id] or {}:
+                    metadata.setdefault(key, None)
+                seen_ids.append(doc_id)
+                seen_metadatas.append(metadata)
+                continue
+            doc_ids.append(doc_id)
+            doc_texts.append(text)
+            doc_metadatas.append(_chunk_metadata(chunk, extra_metadata))
+
+        if seen_ids:
+            # Metadata-only update: the stored embedding is kept as is
+            collection.update(ids=seen_ids, metadatas=seen_metadatas)
+
+        if not doc_ids:
+            continue
+
+        # Embed here so the model sees full batches; Chroma then skips its
+        # own embedding function for this insert.
         collection.add(
             documents=doc_texts,
+            embeddings=embed_texts_batched(doc_texts).tolist(),
             metadatas=doc_metadatas,
             ids=doc_ids
         )
-        return len(doc_texts)
-    return 0
+        added += len(doc_texts)
+
+    return added
+
+def _open_index_state():
+    conn = sqlite3.connect(INDEX_STATE_PATH, timeout=30)
+    conn.execute(
+        'CREATE TABLE IF NOT EXISTS indexed_files ('
+        'file_sha256 TEXT PRIMARY KEY, filename TEXT NOT NULL, chunks INTEGER NOT NULL)'
+    )
+    return conn
+
+def is_file_indexed(collection, file_hash):
+    """
+    True when mark_file_indexed has recorded this file SHA-256 and its chunks
+    are still in ``collection``.
+
+    A marker whose chunks are gone (e.g. the collection was cleared) is
+    dropped, so the next upload of the file indexes it again.
+    """
+    try:
+        conn = _open_index_state()
+        try:
+            row = conn.execute(
+                'SELECT 1 FROM indexed_files WHERE file_sha256 = ?', (file_hash,)
+            ).fetchone()
+            if row is None:
+                return False
+            if collection.get(where={'file_sha256': file_hash}, limit=1, include=[])['ids']:
+                return True
+            conn.execute('DELETE FROM indexed_files WHERE file_sha256 = ?', (file_hash,))
+            conn.commit()
+            return False
+        finally:
+            conn.close()
+    except Exception as e:
+        logger.warning("Error checking indexed file: %s", e)
+        return False
+
+def mark_file_indexed(file_hash, filename, chunk_count):
+    """
+    Record that every chunk of this file is committed.
+
+    Written only after the last batch succeeds, so a partially indexed file
+    is never treated as done.
+    """
+    conn = _open_index_state()
+    try:
+        conn.execute(
+            'INSERT OR REPLACE INTO indexed_files (file_sha256, filename, chunks) VALUES (?, ?, ?)',
+            (file_hash, filename, chunk_count)
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+def clear_indexed_files():
+    """Forget every completion marker; call whenever the collection is emptied"""
+    conn = _open_index_state()
+    try:
+        conn.execute('DELETE FROM indexed_files')
+        conn.commit()
+    finally:
+        conn.close()
 
 def query_documents(collection, query, n_results=5):
     """Query documents from ChromaDB"""
     try:
-        model = SentenceTransformer(EMBEDDING_MODEL)
-        query_embedding = model.encode([query])
+        query_embedding = embed_texts_batched([query])
         results = collection.query(
             query_embeddings=query_embedding.tolist(),
             n_results=n_results,
             include=['documents', 'metadatas', 'distances']
         )
         return {
+            'ids': results['ids'][0] if results['ids'] else [],
             'documents': results['documents'][0] if results['documents'] else [],
             'metadatas': results['metadatas'][0] if results['metadatas'] else [],
             'distances': results['distances'][0] if results['distances'] else []
         }
     except Exception as e:
-        print(f"Error querying documents: {e}")
-        return {'documents': [], 'metadatas': [], 'distances': []}
+        logger.error("Error querying documents: %s", e)
+        return {'ids': [], 'documents': [], 'metadatas': [], 'distances': []}
+
+def query_documents_batch(collection, queries, n_results=5, query_embeddings=None):
+    """Query ChromaDB for several queries with one encode + one collection.query"""
+    try:
+        if query_embeddings is None:
+            query_embeddings = embed_texts_batched(list(queries))
+        results = collection.query(
+            query_embeddings=np.asarray(query_embeddings, dtype=np.float32).tolist(),
+            n_results=n_results,
+            include=['documents', 'metadatas', 'distances']
+        )
+        return [
+            {
+                'ids': results['ids'][i],
+                'documents': results['documents'][i] if results['documents'] else [],
+                'metadatas': results['metadatas'][i] if results['metadatas'] else [],
+                'distances': results['distances'][i] if results['distances'] else []
+            }
+            for i in range(len(results['ids']))
+        ]
+    except Exception as e:
+        logger.error("Error querying documents: %s", e)
+        return []
+
+def fuse_results_rrf(result_sets, k=60, n_results=20):
+    """Merge several query_documents results with Reciprocal Rank Fusion"""
+    scores = defaultdict(float)
+    rows = {}
+
+    for result in result_sets:
+        ids = result.get('ids') or []
+        for rank, doc_id in enumerate(ids):
+            scores[doc_id] += 1.0 / (k + rank + 1)
+            if doc_id not in rows:
+                rows[doc_id] = {
+                    key: values[rank]
+                    for key, values in result.items()
+                    if rank < len(values)
+                }
+
+    ranked = sorted(scores, key=scores.get, reverse=True)[:n_results]
+    return {
+        key: [rows[doc_id].get(key) for doc_id in ranked]
+        for key in ('ids', 'documents', 'metadatas', 'distances')
+    }
+
+def rerank_documents(query, retrieved, top_k=5):
+    """Re-order query_documents results with a cross-encoder and keep top_k"""
+    documents = retrieved.get('documents') or []
+    if not documents:
+        return retrieved
+
+    try:
+        pairs = [(query, str(doc)) for doc in documents]
+        scores = _get_reranker().predict(pairs, batch_size=32)
+        order = sorted(range(len(documents)), key=lambda i: scores[i], reverse=True)[:top_k]
+    except Exception as e:
+        logger.warning("Error reranking documents: %s", e)
+        order = list(range(min(top_k, len(documents))))
+
+    return {
+        key: [values[i] for i in order if i < len(values)]
+        for key, values in retrieved.items()
+    }
+
+def warm_up(collection):
+    """Load the embedding + rerank models and touch the HNSW index once"""
+    query_embedding = embed_texts_batched(['warmup'])
+    if collection.count():
+        collection.query(query_embeddings=query_embedding.tolist(), n_results=1)
+    _get_reranker().predict([('warmup', 'warmup')])
 
 if __name__ == '__main__':
     print("🔄 Initializing ChromaDB...")
@@ -0,0 +1,43 @@
+# backend/gunicorn.conf.py
+"""
+Gunicorn settings for the Finance Chatbot backend.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+The workload is I/O bound (Gemini, Ollama, ChromaDB), so workers never use
+the plain sync class:
+
+- gthread (default): each worker keeps GUNICORN_THREADS requests in flight.
+  Safest choice while embedding / reranking runs on CPU in-process.
+- gevent (GUNICORN_WORKER_CLASS=gevent): greenlets, up to
+  GUNICORN_WORKER_CONNECTIONS in-flight requests per worker. Gunicorn
+  monkey-patches sockets before it imports the app, so requests / genai
+  calls yield instead of blocking.
+
+Run a single worker and scale with threads (the default). Each worker
+process would load its own SentenceTransformer + CrossEncoder, open its own
+Chroma PersistentClient on the same directory, and run its own upload
+writer thread; upload job status is also kept in process memory. Several
+workers therefore mean N copies of the models, concurrent writers on one
+Chroma/SQLite store, stale collection state, and /api/upload/status 404s
+when a poll reaches a different worker. Only raise WEB_CONCURRENCY once
+uploads and their status move to a shared store.
+
+The app is not preloaded: the worker imports app.py itself and opens the
+ChromaDB client after forking.
+
+Binds 127.0.0.1:5000 locally. When PORT is set (Procfile platforms route
+external traffic to it) the default becomes 0.0.0.0:$PORT; GUNICORN_BIND
+overrides both.
+"""
+
+import os
+
+_default_bind = f"0.0.0.0:{os.environ['PORT']}" if os.getenv("PORT") else "127.0.0.1:5000"
+bind = os.getenv("GUNICORN_BIND", _default_bind)
+workers = int(os.getenv("WEB_CONCURRENCY", 1))
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.getenv("GUNICORN_THREADS", 8))
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", 1000))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 120))
+preload_app = False
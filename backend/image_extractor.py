@@ -1,15 +1,6 @@
-import os
 from typing import Optional
-from google import genai
 
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY", "")
-
-google_client = None
-if GOOGLE_API_KEY:
-    try:
-        google_client = genai.Client(api_key=GOOGLE_API_KEY)
-    except Exception as e:
-        print("[Google Vision Init ERROR]", e)
+from utils.gemini import google_client
 
 
 def extract_text_from_image_with_gemini(image_path: str) -> Optional[str]:
@@ -18,8 +18,13 @@ due to an LLM call.
 
 from __future__ import annotations
 
+import re
 from typing import List, Dict, Any, Optional
 
+# Substring match, same as the old `word in q_lower` checks ("requirement"
+# also covers "requirements").
+_ACTION_RE = re.compile(r"requirement|plan|steps", re.IGNORECASE)
+
 
 def _basic_suggestions(
     user_question: str,
@@ -64,8 +69,7 @@ def _basic_suggestions(
         )
 
     # 4️⃣ If the question mentions 'requirements', 'plan', or 'steps', offer an action-oriented suggestion
-    q_lower = (user_question or "").lower()
-    if any(word in q_lower for word in ["requirement", "requirements", "plan", "steps"]):
+    if user_question and _ACTION_RE.search(user_question):
         suggestions.append(
             {
                 "label": "Create an action plan",
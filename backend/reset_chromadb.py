@@ -37,7 +37,11 @@ chroma_paths = [
     os.path.expanduser("~/AppData/Local/chroma"),
     os.path.expanduser("~/AppData/Roaming/chroma"),
     os.path.join(os.getcwd(), ".chroma"),
-    "backend/.chroma"
+    "backend/.chroma",
+    # Persisted store (CHROMADB_PATH) and its upload markers; removing them
+    # rebuilds the collection with the current settings (e.g. hnsw:space=ip)
+    "backend/chroma_db",
+    "backend/indexed_files.db"
 ]
 
 for path in chroma_paths:
@@ -163,6 +167,7 @@ print("\n")
 # ============================================================================
 
 import os
+import shutil
 import sys
 import glob
 from dotenv import load_dotenv
@@ -189,7 +194,11 @@ if os.path.exists(upload_dir):
     for file in files:
         file_path = os.path.join(upload_dir, file)
         try:
-            os.remove(file_path)
+            # Uploads are stored as <sha256>/<filename>
+            if os.path.isdir(file_path):
+                shutil.rmtree(file_path)
+            else:
+                os.remove(file_path)
             print(f"   ✓ Deleted: {file}")
             deleted_count += 1
         except Exception as e:
@@ -207,7 +216,7 @@ else:
 print("\n[STEP 2] Clearing ChromaDB collection...")
 
 try:
-    from chromadb_setup import initialize_chromadb
+    from chromadb_setup import initialize_chromadb, clear_indexed_files
     import chromadb
     
     # Initialize ChromaDB
@@ -226,6 +235,9 @@ try:
         print(f"   Deleting {len(doc_ids)} documents...")
         collection.delete(ids=doc_ids)
         deleted_count += len(doc_ids)
+
+    # Upload dedup markers describe the chunks just deleted
+    clear_indexed_files()
     
     # Verify deletion
     after_count = collection.count()
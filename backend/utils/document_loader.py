@@ -1,23 +1,66 @@
+import logging
 import os
+import hashlib
+import io
 from typing import List, Any, Optional
 
 from dotenv import load_dotenv
 from unstructured.partition.auto import partition
 from unstructured.chunking.title import chunk_by_title
 from unstructured.documents.elements import Text
-from google import genai
+from PIL import Image, ImageOps
 
-load_dotenv()
+from utils.cache import LRUCache
+from utils.gemini import GOOGLE_MODEL, google_client
 
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY", "")
-GOOGLE_MODEL = os.getenv("GOOGLE_API_MODEL", "gemini-2.5-flash")
+load_dotenv()
 
-google_client: Optional[genai.Client] = None
-if GOOGLE_API_KEY:
-    try:
-        google_client = genai.Client(api_key=GOOGLE_API_KEY)
-    except Exception as e:
-        print(f"[Gemini Init ERROR] {e}")
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = frozenset({".png", ".jpg", ".jpeg"})
+# One round trip per image: description, key facts and OCR text together.
+IMAGE_EXTRACTION_PROMPT = (
+    "Describe this image for a finance document search index. In plain text, provide:\n"
+    "1. A short description of what the image shows (chart, table, flow chart, form, ...).\n"
+    "2. Key financial or academic information it contains (figures, courses, requirements).\n"
+    "3. ALL readable text, reading tables row by row."
+)
+# Gemini tiles images at 1568px; anything larger is rescaled server-side anyway.
+GEMINI_IMAGE_MAX_SIDE = 1568
+
+# Gemini Vision text keyed by SHA-256 of the image bytes, so re-uploads of the
+# same image skip the API call.
+_image_text_cache = LRUCache(maxsize=256)
+
+
+def _to_rgb(img: Image.Image) -> Image.Image:
+    """Flatten onto white so transparent pixels don't turn black in JPEG."""
+    if img.mode in ("RGBA", "LA", "PA") or (img.mode == "P" and "transparency" in img.info):
+        rgba = img.convert("RGBA")
+        background = Image.new("RGB", rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel("A"))
+        return background
+    return img.convert("RGB")
+
+
+def _prepare_image_for_gemini(img_bytes: bytes, mime_type: str):
+    """
+    Decode the image once and downscale it to GEMINI_IMAGE_MAX_SIDE.
+
+    Small images are sent untouched (EXIF included); large ones are rotated
+    upright per their EXIF orientation and re-encoded as JPEG so the upload
+    to Gemini is a fraction of the original size.
+    Returns (mime_type, bytes).
+    """
+    with Image.open(io.BytesIO(img_bytes)) as img:
+        if max(img.size) <= GEMINI_IMAGE_MAX_SIDE:
+            return mime_type, img_bytes
+
+        img = _to_rgb(ImageOps.exif_transpose(img))
+        img.thumbnail((GEMINI_IMAGE_MAX_SIDE, GEMINI_IMAGE_MAX_SIDE), Image.Resampling.LANCZOS)
+        buf = io.BytesIO()
+        img.save(buf, format="JPEG", quality=90)
+        return "image/jpeg", buf.getvalue()
 
 
 def _extract_text_from_image_with_gemini(filepath: str) -> Optional[str]:
@@ -32,7 +75,13 @@ def _extract_text_from_image_with_gemini(filepath: str) -> Optional[str]:
         with open(filepath, "rb") as f:
             img_bytes = f.read()
 
-        prompt = "Extract ALL readable text in plain text."
+        digest = hashlib.sha256(img_bytes).hexdigest()
+        cached = _image_text_cache.get(digest)
+        if cached is not None:
+            return cached
+
+        mime_type, img_bytes = _prepare_image_for_gemini(img_bytes, mime_type)
+        prompt = IMAGE_EXTRACTION_PROMPT
 
         resp = google_client.models.generate_content(
             model=GOOGLE_MODEL,
@@ -45,44 +94,56 @@ def _extract_text_from_image_with_gemini(filepath: str) -> Optional[str]:
             }]
         )
 
-        return getattr(resp, "text", "").strip()
+        text = (getattr(resp, "text", "") or "").strip()
+        if text:
+            _image_text_cache.set(digest, text)
+        return text
 
     except Exception as e:
-        print(f"[Gemini Vision ERROR] {e}")
+        logger.error("[Gemini Vision ERROR] %s", e)
         return None
 
 
+def load_document(filepath: str) -> List[Any]:
+    """Loads a single PDF, TXT, image, DOCX or XLSX file."""
+    filename = os.path.basename(filepath)
+    ext = os.path.splitext(filename)[1].lower()
+
+    logger.info("Loading %s...", filename)
+
+    # Image? → Use Gemini Vision only. Unstructured's image partitioner would
+    # run a local OCR model, which is slow and usually not installed.
+    if ext in IMAGE_EXTENSIONS:
+        text = _extract_text_from_image_with_gemini(filepath)
+        if not text:
+            logger.warning("  No text extracted from image %s", filename)
+            return []
+
+        elem = Text(text=text)
+        elem.metadata = {"source": filename, "file_name": filename}
+        logger.info("  Loaded %s via Gemini Vision", filename)
+        return [elem]
+
+    # Normal text/pdf/docx → Unstructured
+    try:
+        elements = partition(filename=filepath)
+        logger.info("  Loaded %d elements from %s", len(elements), filename)
+        return elements
+    except Exception as e:
+        logger.error("  Error loading %s: %s", filename, e)
+        return []
+
+
 def load_documents(data_dir: str) -> List[Any]:
     """Loads PDFs, TXT, images, DOCX, XLSX using Unstructured + Gemini Vision."""
     raw_documents = []
 
     if not os.path.exists(data_dir):
-        print(f"Directory missing: {data_dir}")
+        logger.warning("Directory missing: %s", data_dir)
         return raw_documents
 
     for filename in os.listdir(data_dir):
-        filepath = os.path.join(data_dir, filename)
-        ext = os.path.splitext(filename)[1].lower()
-
-        print(f"Loading {filename}...")
-
-        # Image? → Use Gemini Vision
-        if ext in [".png", ".jpg", ".jpeg"]:
-            text = _extract_text_from_image_with_gemini(filepath)
-            if text:
-                elem = Text(text=text)
-                elem.metadata = {"source": filename, "file_name": filename}
-                raw_documents.append(elem)
-                print("  ✓ Loaded via Gemini Vision")
-                continue
-
-        # Normal text/pdf/docx → Unstructured
-        try:
-            elements = partition(filename=filepath)
-            raw_documents.extend(elements)
-            print(f"  ✓ Loaded {len(elements)} elements")
-        except Exception as e:
-            print("  ✗ Error:", e)
+        raw_documents.extend(load_document(os.path.join(data_dir, filename)))
 
     return raw_documents
 
@@ -94,5 +155,5 @@ def chunk_documents(raw_documents: List[Any], max_chars=1000):
             parts = chunk_by_title([doc], max_characters=max_chars)
             chunks.extend(parts)
         except Exception as e:
-            print(f"Chunk error: {e}")
+            logger.error("Chunk error: %s", e)
     return chunks
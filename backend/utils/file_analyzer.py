@@ -1,33 +1,31 @@
 import os
-import requests
-from google import genai
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from docx import Document
 from dotenv import load_dotenv
+from openpyxl import load_workbook
+from pypdf import PdfReader
+
+from utils.cache import LRUCache
+from utils.document_loader import load_document
+from utils.gemini import GOOGLE_MODEL, google_client
+from utils.http import OLLAMA_KEEP_ALIVE, session as http_session
 
 load_dotenv()
 
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY", "")
-GOOGLE_MODEL = os.getenv("GOOGLE_API_MODEL", "gemini-2.5-flash")
 OLLAMA_URL = os.getenv("OLLAMA_API_URL", "http://localhost:11434")
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3.2:latest")
 
-google_client = None
-if GOOGLE_API_KEY:
-    try:
-        google_client = genai.Client(api_key=GOOGLE_API_KEY)
-    except Exception as e:
-        print("[Google Init ERROR]", e)
-
-
-class FileAnalyzer:
-
-    @staticmethod
-    def analyze_with_google(file_path, file_content):
+# Google calls are pure network wait, so they run here while Ollama runs on
+# the caller's thread.
+_google_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="google-analyze")
 
-        if google_client is None:
-            return {"source": "google", "status": "error", "error": "Google not initialized"}
+PREVIEW_MAX_CHARS = 5000
+# Both analyzers only see the start of the preview.
+PROMPT_PREVIEW_CHARS = 2000
 
-        try:
-            prompt = f"""
+GOOGLE_ANALYSIS_TEMPLATE = """
 Analyze this document and return:
 
 1. Summary (3–5 sentences)
@@ -36,11 +34,116 @@ Analyze this document and return:
 4. Confidence (High/Medium/Low)
 5. Keywords (10)
 
-Document name: {os.path.basename(file_path)}
+Document name: {name}
 Content preview:
-{file_content[:2000]}
+{content}
 """
 
+OLLAMA_ANALYSIS_TEMPLATE = """
+Analyze this document and provide summary, topics, type, confidence, keywords.
+
+Document name: {name}
+Content:
+{content}
+"""
+
+# Extracted previews keyed by the upload's SHA-256 (or (path, mtime_ns, size)
+# when no hash is known): re-analyzing the same file skips the parse. Every
+# upload rewrites the file, so the content hash is what makes re-uploads hit.
+_preview_cache = LRUCache(maxsize=256)
+
+
+# Preview readers yield text lazily so get_file_preview can stop parsing as
+# soon as it has max_chars; only the first pages / rows are ever decoded.
+def _iter_pdf_text(file_path):
+    for page in PdfReader(file_path).pages:
+        yield page.extract_text() or ""
+
+
+def _iter_docx_text(file_path):
+    for paragraph in Document(file_path).paragraphs:
+        yield paragraph.text
+
+
+def _iter_xlsx_text(file_path):
+    workbook = load_workbook(file_path, read_only=True, data_only=True, keep_links=False)
+    try:
+        for sheet in workbook.worksheets:
+            for row in sheet.iter_rows(values_only=True):
+                yield "\t".join(str(v) for v in row if v is not None)
+    finally:
+        workbook.close()
+
+
+def _iter_element_text(file_path):
+    for element in load_document(file_path):
+        yield str(getattr(element, "text", "") or "")
+
+
+_PREVIEW_READERS = {
+    ".pdf": _iter_pdf_text,
+    ".docx": _iter_docx_text,
+    ".xlsx": _iter_xlsx_text,
+}
+
+
+class FileAnalyzer:
+
+    @staticmethod
+    def extract_file_metadata(file_path, filename=None):
+        """Name, type, size and modification time of a saved file."""
+        st = os.stat(file_path)
+        filename = filename or os.path.basename(file_path)
+        return {
+            "filename": filename,
+            "file_type": os.path.splitext(filename)[1].lstrip(".").upper() or "UNKNOWN",
+            "file_size_kb": round(st.st_size / 1024, 2),
+            "modified": datetime.fromtimestamp(st.st_mtime).isoformat(),
+        }
+
+    @staticmethod
+    def get_file_preview(file_path, max_chars=PREVIEW_MAX_CHARS, content_hash=None):
+        """First `max_chars` characters of the file's text, memoized per file content."""
+        ext = os.path.splitext(file_path)[1].lower()
+        if content_hash:
+            key = (content_hash, ext, max_chars)
+        else:
+            st = os.stat(file_path)
+            key = (os.path.abspath(file_path), st.st_mtime_ns, st.st_size, max_chars)
+        cached = _preview_cache.get(key)
+        if cached is not None:
+            return cached
+
+        if ext == ".txt":
+            with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+                preview = f.read(max_chars)
+        else:
+            reader = _PREVIEW_READERS.get(ext, _iter_element_text)
+            parts, length = [], 0
+            for text in reader(file_path):
+                if not text:
+                    continue
+                parts.append(text)
+                length += len(text) + 1
+                if length >= max_chars:
+                    break
+            preview = "\n".join(parts)[:max_chars]
+
+        _preview_cache.set(key, preview)
+        return preview
+
+    @staticmethod
+    def analyze_with_google(file_path, file_content):
+
+        if google_client is None:
+            return {"source": "google", "status": "error", "error": "Google not initialized"}
+
+        try:
+            prompt = GOOGLE_ANALYSIS_TEMPLATE.format(
+                name=os.path.basename(file_path),
+                content=file_content[:PROMPT_PREVIEW_CHARS],
+            )
+
             response = google_client.models.generate_content(
                 model=GOOGLE_MODEL,
                 contents=prompt
@@ -58,17 +161,19 @@ Content preview:
     @staticmethod
     def analyze_with_ollama(file_path, file_content):
         try:
-            prompt = f"""
-Analyze this document and provide summary, topics, type, confidence, keywords.
-
-Document name: {os.path.basename(file_path)}
-Content:
-{file_content[:2000]}
-"""
+            prompt = OLLAMA_ANALYSIS_TEMPLATE.format(
+                name=os.path.basename(file_path),
+                content=file_content[:PROMPT_PREVIEW_CHARS],
+            )
 
-            r = requests.post(
+            r = http_session.post(
                 f"{OLLAMA_URL}/api/generate",
-                json={"model": OLLAMA_MODEL, "prompt": prompt, "stream": False},
+                json={
+                    "model": OLLAMA_MODEL,
+                    "prompt": prompt,
+                    "stream": False,
+                    "keep_alive": OLLAMA_KEEP_ALIVE,
+                },
                 timeout=60
             )
 
@@ -84,3 +189,17 @@ Content:
 
         except Exception as e:
             return {"source": "ollama", "status": "error", "error": str(e)}
+
+    @staticmethod
+    def analyze(file_path, file_content):
+        """Run the Google and Ollama analyses concurrently."""
+        file_content = file_content[:PROMPT_PREVIEW_CHARS]
+        google_future = _google_executor.submit(
+            FileAnalyzer.analyze_with_google, file_path, file_content
+        )
+        ollama_analysis = FileAnalyzer.analyze_with_ollama(file_path, file_content)
+
+        return {
+            "google": google_future.result(),
+            "ollama": ollama_analysis,
+        }
@@ -0,0 +1,22 @@
+import logging
+import os
+from typing import Optional
+
+from dotenv import load_dotenv
+from google import genai
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY", "")
+GOOGLE_MODEL = os.getenv("GOOGLE_API_MODEL", "gemini-2.5-flash")
+
+# One Gemini client for the whole backend, so every module shares its auth
+# state and HTTP connection pool instead of each building its own.
+google_client: Optional[genai.Client] = None
+if GOOGLE_API_KEY:
+    try:
+        google_client = genai.Client(api_key=GOOGLE_API_KEY)
+    except Exception as e:
+        logger.error("[Google Init ERROR] %s", e)
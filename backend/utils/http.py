@@ -0,0 +1,42 @@
+import os
+
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+load_dotenv()
+
+# Keep the Ollama model resident between requests instead of its 5 min
+# default; shared by every module that calls Ollama
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+
+
+def _build_session() -> requests.Session:
+    """
+    One pooled requests.Session for all outbound HTTP (Ollama, health checks).
+
+    Keep-alive connections are reused across calls, so repeated requests skip
+    the TCP/TLS handshake. Idempotent requests retry on transient 502/503/504
+    and once on a failed connect. Read timeouts are never retried: linked
+    pages are fetched on the /api/chat path, and a stalled server would
+    otherwise cost a multiple of its timeout.
+    """
+    s = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=20,
+        pool_maxsize=20,
+        max_retries=Retry(
+            total=2,
+            connect=1,
+            read=0,
+            backoff_factor=0.1,
+            status_forcelist=[502, 503, 504],
+        ),
+    )
+    s.mount("http://", adapter)
+    s.mount("https://", adapter)
+    return s
+
+
+session = _build_session()
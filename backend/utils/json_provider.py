@@ -0,0 +1,27 @@
+import orjson
+from flask.json.provider import DefaultJSONProvider
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider backed by orjson.
+
+    jsonify() and request.get_json() go through the C encoder/decoder. numpy
+    scalars/arrays (e.g. ChromaDB distances) serialize natively; anything else
+    orjson can't handle falls back to Flask's default() hook.
+    """
+
+    _options = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj, default=self.default, option=self._options).decode("utf-8")
+
+    def response(self, *args, **kwargs):
+        # jsonify() path: hand orjson's bytes straight to the Response instead
+        # of decoding to str and letting Werkzeug re-encode it.
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=self.default, option=self._options)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
@@ -1,55 +1,106 @@
+import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, repeat
 from typing import Dict, Any, List, Optional
 
-import requests
-from bs4 import BeautifulSoup
-from google import genai
+import orjson
+import lxml.html
+from lxml import etree
+
+from utils.cache import LRUCache
+from utils.gemini import GOOGLE_MODEL, google_client
+from utils.http import OLLAMA_KEEP_ALIVE, session as http_session
+
+logger = logging.getLogger(__name__)
 
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY", "")
-GOOGLE_MODEL = os.getenv("GOOGLE_API_MODEL", "gemini-2.5-flash")
 OLLAMA_URL = os.getenv("OLLAMA_API_URL", "http://localhost:11434")
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3.2:latest")
+# "fallback": Ollama is only called when Gemini returns nothing.
+# "always": both models answer every question (in parallel).
+OLLAMA_MODE = os.getenv("OLLAMA_MODE", "fallback").lower()
 
-google_client: Optional[genai.Client] = None
-if GOOGLE_API_KEY:
-    try:
-        google_client = genai.Client(api_key=GOOGLE_API_KEY)
-    except Exception as e:
-        print(f"[Google Init ERROR] {e}")
+_query_variants_cache = LRUCache(maxsize=512)
+
+# OLLAMA_MODE=always: Ollama runs here while Gemini runs on the request thread.
+_ollama_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="ollama-answer")
+# Linked pages are fetched (and summarized) in parallel here.
+_url_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="url-fetch")
+MAX_URL_SUMMARIES = 5
 
 
 # -------------------------------------------------------------------
 # URL fetching helper – used to let LLM see page contents
 # -------------------------------------------------------------------
+# Pages are streamed and only the first bytes are read: prompts keep a few KB
+# of text at most, so the rest of a large page is never downloaded or parsed.
+MAX_PAGE_BYTES = 2 * 1024 * 1024
+URL_TEXT_READ_BYTES = 256 * 1024
+URL_SUMMARY_READ_BYTES = 32 * 1024
+
+# Linked pages recur across passages and questions; reuse their text and
+# Gemini summaries for 15 minutes.
+_url_text_cache = LRUCache(maxsize=512, ttl=900)
+_url_summary_cache = LRUCache(maxsize=512, ttl=900)
+
+
+def _get_capped(url: str, timeout: float, max_bytes: int, content_types=None):
+    """
+    GET `url` and read at most `max_bytes` of the (decompressed) body.
+
+    Returns (response, body_bytes), or None for non-200 responses, pages whose
+    Content-Length exceeds MAX_PAGE_BYTES, or a Content-Type outside
+    `content_types` (checked before any of the body is read).
+    """
+    with http_session.get(url, timeout=timeout, stream=True) as resp:
+        if resp.status_code != 200:
+            logger.info("[URL FETCH] HTTP %s for %s", resp.status_code, url)
+            return None
+
+        length = resp.headers.get("Content-Length", "")
+        if length.isdigit() and int(length) > MAX_PAGE_BYTES:
+            logger.info("[URL FETCH] %s bytes, skipping %s", length, url)
+            return None
+
+        content_type = resp.headers.get("Content-Type", "").lower()
+        if content_types and not any(ct in content_type for ct in content_types):
+            logger.info("[URL FETCH] Content-Type %r, skipping %s", content_type, url)
+            return None
+
+        return resp, resp.raw.read(max_bytes, decode_content=True)
+
+
 def _fetch_url_text(url: str, max_chars: int = 2000) -> Optional[str]:
     """
     Fetch a URL and return a cleaned text snippet.
 
-    - Uses requests with a short timeout so backend doesn't hang.
-    - Uses BeautifulSoup to strip scripts/styles.
+    - Uses the pooled HTTP session with a short timeout so backend doesn't hang.
+    - Uses lxml directly to strip scripts/styles.
     - Truncates to max_chars to keep prompts small.
     """
+    cached = _url_text_cache.get((url, max_chars))
+    if cached is not None:
+        return cached
+
     try:
         if not url.lower().startswith(("http://", "https://")):
             return None
 
-        resp = requests.get(url, timeout=6)
-        if resp.status_code != 200:
-            print(f"[URL FETCH] HTTP {resp.status_code} for {url}")
-            return None
-
-        content_type = resp.headers.get("Content-Type", "")
-        if "text/html" not in content_type and "text/plain" not in content_type:
-            # Non-HTML (e.g., PDF) – skip for now
+        # Non-HTML (e.g., PDF) – skip for now
+        fetched = _get_capped(
+            url, timeout=6, max_bytes=URL_TEXT_READ_BYTES, content_types=("text/html", "text/plain")
+        )
+        if fetched is None:
             return None
 
-        soup = BeautifulSoup(resp.text, "html.parser")
+        # Parse with lxml (libxml2) directly: no BeautifulSoup tree to build,
+        # and passing bytes lets it detect the encoding itself
+        doc = lxml.html.fromstring(fetched[1])
 
-        # remove scripts / styles / noscript
-        for tag in soup(["script", "style", "noscript"]):
-            tag.decompose()
+        # remove scripts / styles / noscript (and comments)
+        etree.strip_elements(doc, etree.Comment, "script", "style", "noscript", with_tail=False)
 
-        text = soup.get_text(separator="\n")
+        text = "\n".join(doc.itertext())
         lines = [ln.strip() for ln in text.splitlines()]
         text = "\n".join(ln for ln in lines if ln)
 
@@ -58,10 +109,11 @@ def _fetch_url_text(url: str, max_chars: int = 2000) -> Optional[str]:
 
         if len(text) > max_chars:
             text = text[:max_chars] + "..."
+        _url_text_cache.set((url, max_chars), text)
         return text
 
     except Exception as e:
-        print(f"[URL FETCH ERROR] {url} -> {e}")
+        logger.warning("[URL FETCH ERROR] %s -> %s", url, e)
         return None
 
 
@@ -86,16 +138,20 @@ def _prepare_passages(retrieved: Dict[str, Any]) -> List[Dict[str, Any]]:
 
     passages: List[Dict[str, Any]] = []
 
-    for idx, text in enumerate(docs):
-        base_text = str(text) if text is not None else ""
-        meta = metas[idx] if idx < len(metas) and isinstance(metas[idx], dict) else {}
+    # metas/dists may be shorter than docs; pad them with None
+    rows = [
+        (text, meta if isinstance(meta, dict) else {}, dist)
+        for text, meta, dist in zip(docs, chain(metas, repeat(None)), chain(dists, repeat(None)))
+    ]
+
+    # Fetch every linked page at once; several chunks of one document share
+    # its URL, so each unique URL is fetched once
+    urls = list(dict.fromkeys(meta["url"] for _, meta, _ in rows if meta.get("url")))
+    url_snippets: Dict[str, Optional[str]] = dict(zip(urls, _url_executor.map(_fetch_url_text, urls)))
 
-        distance: Optional[float] = None
-        if idx < len(dists):
-            try:
-                distance = float(dists[idx])
-            except Exception:
-                distance = None
+    for idx, (text, meta, dist) in enumerate(rows):
+        base_text = str(text) if text is not None else ""
+        distance: Optional[float] = float(dist) if isinstance(dist, (int, float)) else None
 
         source = str(meta.get("source", meta.get("file_name", "Unknown")))
         url = meta.get("url") or None
@@ -103,7 +159,7 @@ def _prepare_passages(retrieved: Dict[str, Any]) -> List[Dict[str, Any]]:
         # NEW: fetch URL content (if present) and append as labelled snippet
         url_snippet: Optional[str] = None
         if url:
-            url_snippet = _fetch_url_text(url)
+            url_snippet = url_snippets[url]
             if url_snippet:
                 base_text += (
                     f"\n\n[URL CONTENT SNIPPET from {url}]\n"
@@ -124,35 +180,49 @@ def _prepare_passages(retrieved: Dict[str, Any]) -> List[Dict[str, Any]]:
     return passages
 
 
+# Static parts of the RAG prompt, built once at import.
+_NO_PASSAGES_TEMPLATE = (
+    "You are a helpful **finance-focused** assistant.\n"
+    "No supporting passages were retrieved from the knowledge base.\n\n"
+    "USER QUESTION:\n{user_query}\n\n"
+    "If you cannot answer from your general knowledge for compliance reasons, say so briefly."
+)
+
+_RAG_PREAMBLE = (
+    "You are a helpful **finance-focused** assistant.\n"
+    "You MUST answer the user's question using **only** the information in the provided passages.\n"
+    "Passages may include snippets of content fetched from external URLs.\n"
+    "If the passages do not contain enough information, say so explicitly.\n\n"
+    "Tasks:\n"
+    "1. Read the user's question.\n"
+    "2. Carefully read each passage.\n"
+    "3. Synthesize a clear answer based ONLY on those passages.\n"
+    "4. Provide a short bullet list of key points.\n"
+    "5. List which passage IDs you used.\n"
+)
+
+_RAG_TAIL = (
+    "\nReturn your answer in **this exact markdown structure**:\n\n"
+    "## ANSWER\n"
+    "...your main answer...\n\n"
+    "## KEY POINTS\n"
+    "- point 1\n"
+    "- point 2\n"
+    "- point 3\n\n"
+    "## CITED PASSAGES\n"
+    "- P1: short snippet\n"
+    "- P3: short snippet\n"
+)
+
+
 def _build_prompt(user_query: str, passages: List[Dict[str, Any]]) -> str:
     """
     Build the RAG prompt that instructs the LLM to answer ONLY from the retrieved passages.
     """
     if not passages:
-        return (
-            "You are a helpful **finance-focused** assistant.\n"
-            "No supporting passages were retrieved from the knowledge base.\n\n"
-            f"USER QUESTION:\n{user_query}\n\n"
-            "If you cannot answer from your general knowledge for compliance reasons, say so briefly."
-        )
+        return _NO_PASSAGES_TEMPLATE.format(user_query=user_query)
 
-    lines: List[str] = []
-
-    lines.append(
-        "You are a helpful **finance-focused** assistant.\n"
-        "You MUST answer the user's question using **only** the information in the provided passages.\n"
-        "Passages may include snippets of content fetched from external URLs.\n"
-        "If the passages do not contain enough information, say so explicitly.\n\n"
-        "Tasks:\n"
-        "1. Read the user's question.\n"
-        "2. Carefully read each passage.\n"
-        "3. Synthesize a clear answer based ONLY on those passages.\n"
-        "4. Provide a short bullet list of key points.\n"
-        "5. List which passage IDs you used.\n"
-    )
-
-    lines.append(f"\nUSER QUESTION:\n{user_query}\n")
-    lines.append("PASSAGES:\n")
+    lines: List[str] = [_RAG_PREAMBLE, f"\nUSER QUESTION:\n{user_query}\n", "PASSAGES:\n"]
 
     for p in passages[:10]:  # keep prompt manageable
         snippet = (p.get("text") or "").strip()
@@ -162,18 +232,7 @@ def _build_prompt(user_query: str, passages: List[Dict[str, Any]]) -> str:
         url = p.get("url") or "None"
         lines.append(f"[{p['id']}] (source: {src}, url: {url})\n{snippet}\n")
 
-    lines.append(
-        "\nReturn your answer in **this exact markdown structure**:\n\n"
-        "## ANSWER\n"
-        "...your main answer...\n\n"
-        "## KEY POINTS\n"
-        "- point 1\n"
-        "- point 2\n"
-        "- point 3\n\n"
-        "## CITED PASSAGES\n"
-        "- P1: short snippet\n"
-        "- P3: short snippet\n"
-    )
+    lines.append(_RAG_TAIL)
 
     return "\n".join(lines)
 
@@ -194,32 +253,81 @@ def _call_google(prompt: str) -> Optional[str]:
         text = getattr(resp, "text", "") or ""
         return text.strip() or None
     except Exception as e:
-        print("[Google ERROR]", e)
+        logger.error("[Google ERROR] %s", e)
         return None
 
 
 def _call_ollama(prompt: str) -> Optional[str]:
     """
     Call a local Ollama model with the same RAG prompt.
+
+    The answer is streamed: the 40s timeout applies between tokens rather than
+    to the whole generation, so long answers from a slow model still arrive.
     """
     try:
-        r = requests.post(
+        with http_session.post(
             f"{OLLAMA_URL}/api/generate",
-            json={"model": OLLAMA_MODEL, "prompt": prompt, "stream": False},
+            json={
+                "model": OLLAMA_MODEL,
+                "prompt": prompt,
+                "stream": True,
+                "keep_alive": OLLAMA_KEEP_ALIVE,
+            },
             timeout=40,
-        )
-        if r.status_code != 200:
-            print("[Ollama ERROR]", r.status_code, r.text)
-            return None
-
-        data = r.json()
-        text = data.get("response") or data.get("output") or ""
-        return text.strip() or None
+            stream=True,
+        ) as r:
+            if r.status_code != 200:
+                logger.error("[Ollama ERROR] %s %s", r.status_code, r.text)
+                return None
+
+            parts: List[str] = []
+            for line in r.iter_lines():
+                if not line:
+                    continue
+                data = orjson.loads(line)
+                if data.get("error"):
+                    logger.error("[Ollama ERROR] %s", data["error"])
+                    return None
+                parts.append(data.get("response") or "")
+                if data.get("done"):
+                    break
+
+        return "".join(parts).strip() or None
     except Exception as e:
-        print("[Ollama ERROR]", e)
+        logger.error("[Ollama ERROR] %s", e)
         return None
 
 
+def generate_query_variants(user_query: str, n: int = 3) -> List[str]:
+    """
+    Ask Gemini for `n` short paraphrases of the user's question, used for
+    multi-query retrieval. Returns [] when Gemini is unavailable.
+    """
+    if n <= 0 or google_client is None:
+        return []
+
+    key = user_query.strip().lower()
+    cached = _query_variants_cache.get((key, n))
+    if cached is not None:
+        return cached
+
+    prompt = (
+        f"Rewrite the following question in {n} different ways for a document search engine.\n"
+        "Keep each rewrite under 15 words. Return one rewrite per line, no numbering.\n\n"
+        f"QUESTION: {user_query}"
+    )
+    text = _call_google(prompt) or ""
+    variants = [
+        ln.strip().lstrip("-*0123456789. ").strip()
+        for ln in text.splitlines()
+        if ln.strip()
+    ][:n]
+
+    if variants:
+        _query_variants_cache.set((key, n), variants)
+    return variants
+
+
 def _extract_key_points_from_answer(answer_text: str) -> List[str]:
     """
     Try to find the '## KEY POINTS' section and gather bullets.
@@ -258,6 +366,25 @@ def _extract_key_points_from_answer(answer_text: str) -> List[str]:
     return key_points
 
 
+_URL_SUMMARY_PREAMBLE = (
+    "You are summarizing a web page referenced by a finance chatbot.\n"
+    "Given the following HTML/text content, provide:\n"
+    "1. A short one-line title.\n"
+    "2. 3–5 bullet points summarizing key information that would be useful in a finance/document Q&A context.\n\n"
+    "Return markdown in this structure:\n\n"
+    "### Title\n"
+    "<one line>\n\n"
+    "### Summary\n"
+    "- point 1\n"
+    "- point 2\n"
+    "- point 3\n\n"
+    "### Notes\n"
+    "- Optional notes if needed.\n\n"
+    "-----\n"
+    "PAGE CONTENT:\n"
+)
+
+
 def _summarize_url_page(url: str) -> Optional[Dict[str, str]]:
     """
     Fetch and summarize a web page linked in the document metadata.
@@ -266,37 +393,30 @@ def _summarize_url_page(url: str) -> Optional[Dict[str, str]]:
     if google_client is None:
         return None
 
+    cached = _url_summary_cache.get(url)
+    if cached is not None:
+        return cached
+
     try:
-        resp = requests.get(url, timeout=8)
-        if resp.status_code != 200:
-            print(f"[URL SUMMARY] HTTP {resp.status_code} for {url}")
+        # Only HTML pages are summarized; PDFs, images, etc. would be binary noise
+        fetched = _get_capped(
+            url,
+            timeout=8,
+            max_bytes=URL_SUMMARY_READ_BYTES,
+            content_types=("text/html", "application/xhtml+xml"),
+        )
+        if fetched is None:
             return None
 
-        raw_html = resp.text
+        resp, body = fetched
+        raw_html = body.decode(resp.encoding or "utf-8", errors="ignore")
         if not raw_html:
             return None
 
         # Keep content limited to avoid huge prompts
         snippet = raw_html[:8000]
 
-        prompt = (
-            "You are summarizing a web page referenced by a finance chatbot.\n"
-            "Given the following HTML/text content, provide:\n"
-            "1. A short one-line title.\n"
-            "2. 3–5 bullet points summarizing key information that would be useful in a finance/document Q&A context.\n\n"
-            "Return markdown in this structure:\n\n"
-            "### Title\n"
-            "<one line>\n\n"
-            "### Summary\n"
-            "- point 1\n"
-            "- point 2\n"
-            "- point 3\n\n"
-            "### Notes\n"
-            "- Optional notes if needed.\n\n"
-            "-----\n"
-            "PAGE CONTENT:\n"
-            f"{snippet}\n"
-        )
+        prompt = f"{_URL_SUMMARY_PREAMBLE}{snippet}\n"
 
         resp2 = google_client.models.generate_content(
             model=GOOGLE_MODEL,
@@ -307,13 +427,15 @@ def _summarize_url_page(url: str) -> Optional[Dict[str, str]]:
         if not summary_text:
             return None
 
-        return {
+        summary = {
             "url": url,
             "summary_markdown": summary_text,
         }
+        _url_summary_cache.set(url, summary)
+        return summary
 
     except Exception as e:
-        print(f"[URL SUMMARY ERROR] for {url}: {e}")
+        logger.warning("[URL SUMMARY ERROR] for %s: %s", url, e)
         return None
 
 
@@ -359,8 +481,15 @@ def generate_detailed_response(user_query: str, retrieved: Dict[str, Any]) -> Di
     passages = _prepare_passages(retrieved)
     prompt = _build_prompt(user_query, passages)
 
-    google_raw = _call_google(prompt)
-    ollama_raw = _call_ollama(prompt)
+    if OLLAMA_MODE == "always":
+        ollama_future = _ollama_executor.submit(_call_ollama, prompt)
+        google_raw = _call_google(prompt)
+        ollama_raw = ollama_future.result()
+    else:
+        # Ollama is a fallback only: never queue a local generation whose
+        # answer would be discarded
+        google_raw = _call_google(prompt)
+        ollama_raw = None if google_raw else _call_ollama(prompt)
 
     main_response: str
     model_used = "none"
@@ -385,19 +514,12 @@ def generate_detailed_response(user_query: str, retrieved: Dict[str, Any]) -> Di
     key_points = _extract_key_points_from_answer(main_response)
     sections = _build_sections_from_passages(passages)
 
-    # Summarize any URLs that appear in the passages (at most 5 unique URLs)
-    url_summaries: List[Dict[str, str]] = []
-    seen_urls = set()
-    for p in passages:
-        url = p.get("url")
-        if not url or url in seen_urls:
-            continue
-        summary = _summarize_url_page(url)
-        if summary:
-            url_summaries.append(summary)
-            seen_urls.add(url)
-        if len(url_summaries) >= 5:
-            break
+    # Summarize any URLs that appear in the passages (at most 5 unique URLs),
+    # all pages at once; map() keeps passage order
+    urls = list(dict.fromkeys(p["url"] for p in passages if p.get("url")))
+    url_summaries: List[Dict[str, str]] = [
+        summary for summary in _url_executor.map(_summarize_url_page, urls) if summary
+    ][:MAX_URL_SUMMARIES]
 
     return {
         "main_response": main_response,
@@ -0,0 +1,94 @@
+import threading
+import time
+from typing import Any, Hashable, Optional
+
+import numpy as np
+
+
+class SemanticCache:
+    """
+    Thread-safe LRU cache keyed by unit-normalized embedding vectors.
+
+    A lookup is one matmul against the stacked cache matrix; the best entry is
+    returned when its cosine similarity is at least ``threshold``. Entries can
+    carry a ``guard`` (any hashable); a lookup only considers entries whose
+    guard equals its own, e.g. to separate data versions or to require the
+    same numbers / codes in both queries.
+
+    - maxsize:   number of entries kept before the least recently used is evicted.
+    - threshold: minimum cosine similarity for a hit.
+    - ttl:       seconds an entry stays valid (None = no expiry).
+    """
+
+    def __init__(self, maxsize: int = 1024, threshold: float = 0.95, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.threshold = threshold
+        self.ttl = ttl
+        self._matrix: Optional[np.ndarray] = None  # (maxsize, dim) float32
+        self._values = [None] * maxsize
+        self._guards = [None] * maxsize
+        self._stored_at = np.zeros(maxsize, dtype=np.float64)
+        self._last_used = np.zeros(maxsize, dtype=np.int64)
+        self._filled = np.zeros(maxsize, dtype=bool)
+        self._tick = 0
+        self._lock = threading.Lock()
+
+    def get(self, vector: np.ndarray, default: Any = None, *, guard: Hashable = None) -> Any:
+        with self._lock:
+            if self._matrix is None or not self._filled.any():
+                return default
+
+            if self.ttl is not None:
+                # Drop expired entries before ranking, so a stale best match
+                # can't hide a live one above the threshold
+                expired = self._filled & (time.monotonic() - self._stored_at > self.ttl)
+                for slot in np.flatnonzero(expired):
+                    self._evict(int(slot))
+
+            candidates = self._filled & np.fromiter(
+                (g == guard for g in self._guards), dtype=bool, count=self.maxsize
+            )
+            if not candidates.any():
+                return default
+
+            sims = self._matrix @ np.ascontiguousarray(vector, dtype=np.float32)
+            sims[~candidates] = -1.0
+            slot = int(np.argmax(sims))
+            if sims[slot] < self.threshold:
+                return default
+
+            self._tick += 1
+            self._last_used[slot] = self._tick
+            return self._values[slot]
+
+    def set(self, vector: np.ndarray, value: Any, *, guard: Hashable = None) -> None:
+        vector = np.ascontiguousarray(vector, dtype=np.float32)
+        with self._lock:
+            if self._matrix is None or self._matrix.shape[1] != vector.shape[0]:
+                self._matrix = np.zeros((self.maxsize, vector.shape[0]), dtype=np.float32)
+                self._filled[:] = False
+
+            free = np.flatnonzero(~self._filled)
+            slot = int(free[0]) if free.size else int(np.argmin(self._last_used))
+
+            self._tick += 1
+            self._matrix[slot] = vector
+            self._values[slot] = value
+            self._guards[slot] = guard
+            self._stored_at[slot] = time.monotonic()
+            self._last_used[slot] = self._tick
+            self._filled[slot] = True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._filled[:] = False
+            self._values = [None] * self.maxsize
+            self._guards = [None] * self.maxsize
+
+    def _evict(self, slot: int) -> None:
+        self._filled[slot] = False
+        self._values[slot] = None
+        self._guards[slot] = None
+
+    def __len__(self) -> int:
+        return int(self._filled.sum())
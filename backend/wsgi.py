@@ -0,0 +1,11 @@
+"""
+WSGI entry point for production serving:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+`python app.py` still starts the Flask dev server for local work.
+"""
+
+from app import app
+
+__all__ = ["app"]
@@ -113,6 +113,11 @@ def analyze_batch_files(files):
         data = response.json()
 
         st.success(f"✅ Analyzed {data['files_analyzed']} file(s)")
+        if data.get("skipped"):
+            st.warning(
+                f"⚠️ Skipped {len(data['skipped'])} file(s) over the batch limit: "
+                + ", ".join(data["skipped"])
+            )
 
         for result in data["results"]:
             with st.expander(f"📄 {result['file']['filename']}"):
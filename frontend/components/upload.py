@@ -96,12 +96,19 @@ def upload_files_handler(uploaded_files):
 
             progress_bar.progress(50)
 
-            if response.status_code == 200:
+            if response.status_code in (200, 202):
                 result = response.json()
 
-                progress_bar.progress(75)
-                status_text.info("⏳ Processing documents...")
-                time.sleep(1)
+                # Indexing runs in the background; poll until the job finishes
+                if response.status_code == 202:
+                    progress_bar.progress(75)
+                    status_text.info("⏳ Processing documents...")
+                    job = wait_for_upload_job(result["job_id"])
+                    if job.get("status") != "done":
+                        st.error(f"❌ Processing Failed: {job.get('error', job.get('status'))}")
+                        return
+                    result["documents_added"] = job.get("documents_added", 0)
+
                 progress_bar.progress(100)
 
                 st.markdown("---")
@@ -175,3 +182,32 @@ def get_total_documents():
     except Exception:
         pass
     return 0
+
+
+MAX_UNKNOWN_POLLS = 5
+
+
+def wait_for_upload_job(job_id, timeout=600, interval=1.0):
+    """
+    Poll /api/upload/status/<job_id> until the job is done or errors.
+
+    Job state lives in backend memory, so a job that stays "unknown" was lost
+    (backend restart or eviction); give up after a few such answers instead
+    of polling until the timeout.
+    """
+    deadline = time.time() + timeout
+    unknown_polls = 0
+    while time.time() < deadline:
+        try:
+            response = requests.get(f"{API_URL}/api/upload/status/{job_id}", timeout=5)
+            job = response.json()
+            status = job.get("status")
+            if status in ("done", "error"):
+                return job
+            unknown_polls = unknown_polls + 1 if status == "unknown" else 0
+            if unknown_polls >= MAX_UNKNOWN_POLLS:
+                return {"status": "error", "error": "Upload job was lost by the backend; please upload again"}
+        except Exception:
+            pass
+        time.sleep(interval)
+    return {"status": "timeout", "error": "Processing is taking longer than expected"}
@@ -69,7 +69,8 @@ def upload_files(files):
 
         resp = requests.post(f"{API_URL}/api/upload", files=file_tuples, timeout=120)
 
-        if resp.status_code == 200:
+        # 202: files saved, indexing continues in the background (see job_id)
+        if resp.status_code in (200, 202):
             return resp.json()
         else:
             try: